@@ -2,8 +2,46 @@
 
 This module defines a custom reasoning and action agent graph.
 It invokes tools in a simple loop.
+
+The graph is compiled lazily on first access of `moana.graph`,
+so importing the package does not build models, stores or executors.
 """
 
-from moana.graph import graph
+import sys
+from types import ModuleType
+from typing import Any
+
+__all__ = ["graph", "get_graph", "warmup"]
+
+
+def get_graph() -> Any:
+    """Get the compiled agent graph, compiling it on first call."""
+    from moana.graph import get_graph as compile_graph
+
+    compiled = compile_graph()
+    # Cache it as a module global, so later accesses skip __getattr__
+    globals()["graph"] = compiled
+    return compiled
+
+
+def __getattr__(name: str) -> Any:
+    if name == "graph":
+        return get_graph()
+    if name == "warmup":
+        from moana.warmup import warmup
+
+        return warmup
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _Package(ModuleType):
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Importing the `moana.graph` or `moana.warmup` submodules binds them as
+        # package attributes, keep those names for the compiled graph and the
+        # warm-up function as the public API expects
+        if name in ("graph", "warmup") and isinstance(value, ModuleType):
+            return
+        super().__setattr__(name, value)
+
 
-__all__ = ["graph"]
+sys.modules[__name__].__class__ = _Package
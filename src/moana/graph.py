@@ -4,11 +4,13 @@ Works with a chat model with tool calling support.
 """
 
 from datetime import datetime, timezone
-from typing import Dict, List, Literal, cast
+from functools import cache
+from typing import Any, Dict, List, Literal, cast
 
 from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolNode
 
 from moana.configuration import Configuration
@@ -17,7 +19,7 @@ from moana.tools import TOOLS
 from moana.utils import load_chat_model
 
 # Import memory-related functionality
-from moana.memory import store, recall, memorize, checkpointer
+from moana.memory import get_memory_store, recall, memorize, checkpointer
 
 # Define the function that calls the model
 async def call_model(
@@ -119,12 +121,28 @@ builder.add_conditional_edges(
 # This creates a cycle: after using tools, we always return to the model
 builder.add_edge("tools", "call_model")
 
-# Compile the builder into an executable graph
-# You can customize this by adding interrupt points for state updates
-graph = builder.compile(
-    interrupt_before=[],  # Add node names here to update state before they're called
-    interrupt_after=[],  # Add node names here to update state after they're called
-    store=store,  # Add the memory store to the graph
-    checkpointer=checkpointer
-)
-graph.name = "Moana"  # This customizes the name in LangSmith
+
+@cache
+def get_graph() -> "CompiledStateGraph[State, None, State, State]":
+    """Compile the graph on first call and return the same instance afterwards.
+
+    Compilation also creates the long-term memory store,
+    so it is deferred until the graph is actually needed.
+    """
+    # Compile the builder into an executable graph
+    # You can customize this by adding interrupt points for state updates
+    compiled = builder.compile(
+        interrupt_before=[],  # Add node names here to update state before they're called
+        interrupt_after=[],  # Add node names here to update state after they're called
+        store=get_memory_store(),  # Add the memory store to the graph
+        checkpointer=checkpointer
+    )
+    compiled.name = "Moana"  # This customizes the name in LangSmith
+    return compiled
+
+
+def __getattr__(name: str) -> Any:
+    # `graph` is compiled lazily on first access, see get_graph
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,8 @@
 """Memory management package for Moana."""
 
-from .long_term import store
+from typing import Any
+
+from .long_term import get_memory_store, get_memory_manager, get_memory_extractor, get_memory_executor
 from .subconscious import recall, memorize
 from .models import Memory
 from .short_term import checkpointer
@@ -8,9 +10,18 @@ from .short_term import checkpointer
 __all__ = [
     "Memory",
     "store",
-    "memory_manager",
-    "executor",
+    "get_memory_store",
+    "get_memory_manager",
+    "get_memory_extractor",
+    "get_memory_executor",
     "recall",
     "memorize",
     "checkpointer"
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name: str) -> Any:
+    # The store is built lazily, see long_term.get_memory_store
+    if name == "store":
+        return get_memory_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,552 @@
+"""Bulk ingestion of conversation transcripts into long-term memory.
+
+Backfills the same `memories`, `triples`, `profile` and `episodes` namespaces
+that `memorize` fills during live conversations.
+
+Transcripts are read from a JSONL file, one conversation per line:
+
+    {"user_id": "user123", "messages": [{"role": "user", "content": "..."}, ...]}
+
+The file is streamed, so memory use does not depend on its size.
+Conversations are routed to workers by user, so each user's conversations are
+processed in file order by a single worker and never race on the same namespace.
+Store writes (and so embeddings) are batched per worker.
+Like live conversations, each conversation is extracted along with the user's
+existing memories most relevant to it, so they are updated instead of duplicated.
+
+A conversation that cannot be parsed or extracted is logged and skipped, and
+optionally appended to a dead-letter JSONL file to be looked at and retried later.
+Transient model errors (rate limits, timeouts, server errors) are retried with backoff.
+
+Progress is saved to a checkpoint file as a byte offset into the transcripts,
+so an interrupted run can be resumed. The store itself lives in memory, so pass
+a snapshot file to persist the memories along with the checkpoint:
+
+    python -m moana.memory.ingestion transcripts.jsonl --checkpoint ingest.ckpt --snapshot memory.snap
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
+
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.store.base import BaseStore, PutOp, SearchItem, SearchOp
+from langgraph.store.memory import InMemoryStore
+from langmem.utils import get_dialated_windows  # type: ignore[import-untyped]
+from pydantic import BaseModel
+
+from .long_term import (
+    MEMORY_KINDS,
+    create_store,
+    get_memory_extractor,
+    get_memory_store,
+)
+from .snapshot import acquire_writer_lock, restore, snapshot
+
+logger = logging.getLogger(__name__)
+
+# Number of existing memories of each kind, most relevant to a conversation,
+# passed to the extractor for updates
+EXISTING_MEMORIES_LIMIT = 20
+
+# HTTP statuses of model API errors that are worth retrying
+TRANSIENT_STATUS_CODES = {408, 409, 429}
+
+T = TypeVar("T")
+
+
+@dataclass
+class Transcript:
+    """A single conversation read from a transcripts file."""
+
+    user_id: str
+    messages: List[Dict[str, str]]
+    index: int
+    """Position of the conversation in the file, counting from the start offset."""
+    end_offset: int
+    """Byte offset right after this conversation's line."""
+    error: Optional[str] = None
+    """Why the line could not be parsed, the conversation is skipped if set."""
+    line: Optional[str] = None
+    """The raw line, kept only for lines that could not be parsed."""
+
+
+@dataclass
+class IngestionStats:
+    """Throughput counters of an ingestion run."""
+
+    conversations: int = 0
+    tokens: int = 0
+    """Approximate number of tokens in the ingested conversations."""
+    memories: int = 0
+    skipped: int = 0
+    """Conversations skipped because they could not be parsed or extracted."""
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the run started."""
+        return time.perf_counter() - self.started_at
+
+    @property
+    def conversations_per_second(self) -> float:
+        """Ingested conversations per second."""
+        return self.conversations / max(self.elapsed, 1e-9)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Ingested tokens per second."""
+        return self.tokens / max(self.elapsed, 1e-9)
+
+    def format(self) -> str:
+        """Format the counters as a single progress line."""
+        return (
+            f"{self.conversations} conversations, {self.tokens} tokens, "
+            f"{self.memories} memories, {self.skipped} skipped in {self.elapsed:.1f}s "
+            f"({self.conversations_per_second:.2f} conversations/s, "
+            f"{self.tokens_per_second:.0f} tokens/s)"
+        )
+
+
+def read_transcripts(path: str, start_offset: int = 0) -> Iterator[Transcript]:
+    """Stream transcripts from a JSONL file, starting at a byte offset.
+
+    Args:
+        path (str): Path to the JSONL transcripts file.
+        start_offset (int): Byte offset to start reading from, as saved in a checkpoint.
+    """
+    with open(path, "rb") as file:
+        file.seek(start_offset)
+        offset = start_offset
+        index = 0
+        for line in file:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                transcript = Transcript(
+                    user_id=str(record["user_id"]),
+                    messages=list(record["messages"]),
+                    index=index,
+                    end_offset=offset,
+                )
+            except (ValueError, KeyError, TypeError) as error:
+                transcript = Transcript(
+                    user_id="",
+                    messages=[],
+                    index=index,
+                    end_offset=offset,
+                    error=f"Invalid transcript: {error!r}",
+                    line=line.decode(errors="replace"),
+                )
+            yield transcript
+            index += 1
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, int]:
+    """Load a checkpoint, or return an empty one if there is none yet."""
+    if not path or not os.path.exists(path):
+        return {"offset": 0, "conversations": 0}
+    with open(path) as file:
+        checkpoint: Dict[str, int] = json.load(file)
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, int]) -> None:
+    """Atomically write a checkpoint, so a crash never leaves a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
+
+
+class _Progress:
+    """Track which conversations are persisted, to know where it is safe to resume from.
+
+    Workers finish conversations out of order, so the checkpoint only moves past
+    a conversation once it and all conversations before it are written to the store.
+    """
+
+    def __init__(self, start_offset: int):
+        self.offset = start_offset
+        self._next_index = 0
+        self._done: Dict[int, int] = {}
+
+    def mark_done(self, transcripts: List[Transcript]) -> None:
+        for transcript in transcripts:
+            self._done[transcript.index] = transcript.end_offset
+        while self._next_index in self._done:
+            self.offset = self._done.pop(self._next_index)
+            self._next_index += 1
+
+    @property
+    def persisted(self) -> int:
+        """Number of conversations persisted in order since the start offset."""
+        return self._next_index
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Check whether a model API error is likely to go away on retry."""
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in TRANSIENT_STATUS_CODES or status_code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # Provider SDKs raise e.g. APIConnectionError or APITimeoutError without a status
+    return any(name in type(error).__name__ for name in ("Timeout", "Connection", "RateLimit"))
+
+
+async def _with_retries(call: Callable[[], Awaitable[T]], retries: int, retry_delay: float) -> T:
+    """Await `call`, retrying transient errors with exponential backoff and jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return await call()
+        except Exception as error:
+            if attempt == retries or not _is_transient(error):
+                raise
+            delay = retry_delay * 2**attempt * (1 + random.random())
+            logger.warning("Retrying in %.1fs after transient error: %r", delay, error)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+class _DeadLetters:
+    """Log skipped conversations and append them to a dead-letter JSONL file."""
+
+    def __init__(self, path: Optional[str], stats: IngestionStats):
+        self.path = path
+        self.stats = stats
+
+    def add(self, transcript: Transcript, error: str) -> None:
+        self.stats.skipped += 1
+        logger.warning("Skipping conversation ending at byte %d: %s", transcript.end_offset, error)
+        if not self.path:
+            return
+        record: Dict[str, Any] = {"end_offset": transcript.end_offset, "error": error}
+        if transcript.line is not None:
+            record["line"] = transcript.line
+        else:
+            record["user_id"] = transcript.user_id
+            record["messages"] = transcript.messages
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+
+def _unique_text_batches(store: BaseStore, ops: List[PutOp]) -> List[List[PutOp]]:
+    """Split puts into batches where no text to embed appears twice.
+
+    InMemoryStore embeds each distinct text of a batch once, and then fails
+    to match embeddings to puts when two of them share a text. Identical
+    values are common across users (e.g. an "Unknown" profile), so such puts
+    go to separate batches.
+    """
+    extract_texts = getattr(store, "_extract_texts", None)
+    if extract_texts is None:
+        return [ops]
+
+    batches: List[Tuple[List[PutOp], set[str]]] = []
+    for op in ops:
+        texts = set(extract_texts({(op.namespace, op.key): op}))
+        for batch, batch_texts in batches:
+            if batch_texts.isdisjoint(texts):
+                batch.append(op)
+                batch_texts.update(texts)
+                break
+        else:
+            batches.append(([op], texts))
+    return [batch for batch, _ in batches]
+
+
+class _Worker:
+    """Extract memories from one user's conversations at a time and batch their writes."""
+
+    def __init__(
+        self,
+        store: BaseStore,
+        batch_size: int,
+        progress: _Progress,
+        stats: IngestionStats,
+        dead_letters: Optional[_DeadLetters] = None,
+        retries: int = 3,
+        retry_delay: float = 1.0,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = stats
+        self.dead_letters = dead_letters or _DeadLetters(None, stats)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue[Optional[Transcript]] = asyncio.Queue(maxsize=batch_size)
+        # Pending writes keyed by (namespace, key), so repeated updates collapse into one
+        self._pending: Dict[Tuple[Tuple[str, ...], str], PutOp] = {}
+        self._unflushed: List[Transcript] = []
+
+    async def run(self) -> None:
+        while (transcript := await self.queue.get()) is not None:
+            await self.ingest(transcript)
+        await self.flush()
+
+    async def ingest(self, transcript: Transcript) -> None:
+        try:
+            existing = await self.search_existing(transcript)
+            extracted = await asyncio.gather(
+                *(self.extract(transcript, kind, existing[kind]) for kind in MEMORY_KINDS)
+            )
+        except Exception as error:
+            # Skip the whole conversation, so it is never half ingested
+            self.dead_letters.add(transcript, repr(error))
+        else:
+            for ops in extracted:
+                for op in ops:
+                    self._pending[(op.namespace, op.key)] = op
+            self.stats.memories += sum(len(ops) for ops in extracted)
+            self.stats.conversations += 1
+            self.stats.tokens += count_tokens_approximately(transcript.messages)
+        # Skipped conversations are done too, so the checkpoint moves past them
+        self._unflushed.append(transcript)
+        if len(self._pending) >= self.batch_size or len(self._unflushed) >= self.batch_size:
+            await self.flush()
+
+    async def search_existing(self, transcript: Transcript) -> Dict[str, Dict[str, Tuple[str, str, Any]]]:
+        """Find the existing memories of each kind that are relevant to a conversation.
+
+        Like the live memory manager, searches with windows of the latest messages
+        of the conversation. All kinds are searched in one batch, so each query
+        is embedded once. Memories extracted by this worker but not yet written
+        are always included.
+        """
+        queries = get_dialated_windows(transcript.messages, EXISTING_MEMORIES_LIMIT // 4)
+        ops = [
+            SearchOp((transcript.user_id, kind), query=query, limit=EXISTING_MEMORIES_LIMIT)
+            for kind in MEMORY_KINDS
+            for query in queries
+        ]
+        found: Dict[str, Dict[str, SearchItem]] = {kind: {} for kind in MEMORY_KINDS}
+        for op, results in zip(ops, await self.store.abatch(ops) if ops else []):
+            for item in cast(List[SearchItem], results):
+                found[op.namespace_prefix[1]][item.key] = item
+
+        existing: Dict[str, Dict[str, Tuple[str, str, Any]]] = {}
+        for kind, items in found.items():
+            relevant = sorted(
+                items.values(),
+                key=lambda item: item.score if item.score is not None else float("-inf"),
+                reverse=True,
+            )[:EXISTING_MEMORIES_LIMIT]
+            existing[kind] = {
+                item.key: (item.key, item.value["kind"], item.value["content"]) for item in relevant
+            }
+        for ((user_id, kind), key), put in self._pending.items():
+            if user_id == transcript.user_id and put.value is not None:
+                existing[kind][key] = (key, put.value["kind"], put.value["content"])
+        return existing
+
+    async def extract(
+        self, transcript: Transcript, kind: str, existing: Dict[str, Tuple[str, str, Any]]
+    ) -> List[PutOp]:
+        """Extract memories of one kind, updating the given existing memories of that kind."""
+        namespace = (transcript.user_id, kind)
+        extractor = get_memory_extractor(kind)
+        extracted = await _with_retries(
+            lambda: extractor.ainvoke(
+                {"messages": transcript.messages, "existing": list(existing.values())}
+            ),
+            self.retries,
+            self.retry_delay,
+        )
+        # Same rules as MemoryStoreManager when it applies the extractor's output
+        ops = []
+        for memory in extracted:
+            key = str(memory.id)
+            content = memory.content
+            if isinstance(content, BaseModel):
+                if type(content).__name__ == "RemoveDoc":
+                    continue
+                value = {"kind": type(content).__name__, "content": content.model_dump(mode="json")}
+            else:
+                # Existing memories the extractor left untouched come back as plain dicts
+                value = {"kind": existing.get(key, (key, "Memory", None))[1], "content": content}
+            # Rewriting an unchanged memory would only re-embed it and reset its created_at
+            if key in existing and existing[key][1:] == (value["kind"], value["content"]):
+                continue
+            ops.append(PutOp(namespace, key, value))
+        return ops
+
+    async def flush(self) -> None:
+        """Write pending memories in as few batches as possible, embedding each batch together."""
+        if self._pending:
+            for batch in _unique_text_batches(self.store, list(self._pending.values())):
+                await self.store.abatch(batch)
+            self._pending.clear()
+        self.progress.mark_done(self._unflushed)
+        self._unflushed.clear()
+
+
+async def ingest_transcripts(
+    path: str,
+    *,
+    store: Optional[InMemoryStore] = None,
+    workers: int = 8,
+    batch_size: int = 64,
+    checkpoint_path: Optional[str] = None,
+    report_every: float = 10.0,
+    snapshot_path: Optional[str] = None,
+    snapshot_every: float = 300.0,
+    dead_letter_path: Optional[str] = None,
+    retries: int = 3,
+    retry_delay: float = 1.0,
+) -> IngestionStats:
+    """Ingest a JSONL transcripts file into long-term memory.
+
+    Args:
+        path (str): Path to the JSONL transcripts file.
+        store: Store to write memories to, defaults to the shared long-term memory store.
+        workers (int): Number of concurrent extraction workers.
+        batch_size (int): Number of memories written to the store in one batch.
+        checkpoint_path (str, optional): File to resume from and save progress to.
+            Requires `snapshot_path`, otherwise the checkpoint would skip conversations
+            whose memories were lost with the process.
+        report_every (float): Seconds between progress reports.
+        snapshot_path (str, optional): Store snapshot written before each checkpoint save,
+            so saved progress never runs ahead of persisted memories.
+        snapshot_every (float): Seconds between snapshots, and so checkpoint saves.
+            Each snapshot rewrites the whole store, so keep this well above `report_every`.
+        dead_letter_path (str, optional): JSONL file skipped conversations are appended to.
+        retries (int): Retries of transient model errors per extraction.
+        retry_delay (float): Seconds before the first retry, doubled on each next one.
+
+    Returns:
+        IngestionStats: Throughput counters of this run.
+
+    Raises:
+        ValueError: If a checkpoint is requested without a snapshot to persist memories to.
+        RuntimeError: If another process already writes to the snapshot.
+    """
+    if checkpoint_path and not snapshot_path:
+        raise ValueError(
+            "A checkpoint requires a snapshot path, the store only keeps memories in process memory"
+        )
+    # A snapshot has a single writer, so a backfill never overwrites
+    # the snapshot of a running server or of another backfill
+    writer_lock = acquire_writer_lock(snapshot_path) if snapshot_path else None
+    if snapshot_path and writer_lock is None:
+        raise RuntimeError(f"Another process writes snapshots to {snapshot_path}")
+
+    store = store if store is not None else get_memory_store()
+    checkpoint = load_checkpoint(checkpoint_path)
+    progress = _Progress(checkpoint["offset"])
+    stats = IngestionStats()
+    dead_letters = _DeadLetters(dead_letter_path, stats)
+    pool = [
+        _Worker(store, batch_size, progress, stats, dead_letters, retries, retry_delay)
+        for _ in range(workers)
+    ]
+    finished = asyncio.Event()
+
+    async def save() -> None:
+        # Capture progress before the snapshot, so the snapshot is never behind it
+        saved = {
+            "offset": progress.offset,
+            "conversations": checkpoint["conversations"] + progress.persisted,
+        }
+        if snapshot_path:
+            await asyncio.to_thread(snapshot, store, snapshot_path)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, saved)
+
+    async def read() -> None:
+        for transcript in read_transcripts(path, checkpoint["offset"]):
+            if transcript.error:
+                dead_letters.add(transcript, transcript.error)
+                progress.mark_done([transcript])
+                continue
+            # Route by user, so all conversations of a user go through the same worker
+            worker = pool[zlib.crc32(transcript.user_id.encode()) % workers]
+            await worker.queue.put(transcript)
+        for worker in pool:
+            await worker.queue.put(None)
+
+    async def report() -> None:
+        saved_at = time.perf_counter()
+        while not finished.is_set():
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=report_every)
+            except TimeoutError:
+                logger.info(stats.format())
+                if time.perf_counter() - saved_at >= snapshot_every:
+                    await save()
+                    saved_at = time.perf_counter()
+
+    with writer_lock or contextlib.nullcontext():
+        async with asyncio.TaskGroup() as group:
+            reporter = group.create_task(report())
+            async with asyncio.TaskGroup() as ingestion:
+                ingestion.create_task(read())
+                for worker in pool:
+                    ingestion.create_task(worker.run())
+            finished.set()
+            await reporter
+
+        await save()
+    logger.info(stats.format())
+    return stats
+
+
+def main() -> None:
+    """Run ingestion from the command line."""
+    parser = argparse.ArgumentParser(description="Backfill long-term memory from JSONL transcripts.")
+    parser.add_argument("path", help="JSONL file with one conversation per line")
+    parser.add_argument("--workers", type=int, default=8, help="number of concurrent extraction workers")
+    parser.add_argument("--batch-size", type=int, default=64, help="memories written to the store per batch")
+    parser.add_argument("--checkpoint", help="checkpoint file to resume from and save progress to")
+    parser.add_argument("--snapshot", required=True, help="store snapshot to restore from and save to")
+    parser.add_argument("--dead-letter", help="JSONL file to append skipped conversations to")
+    parser.add_argument("--retries", type=int, default=3, help="retries of transient model errors")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress reports")
+    parser.add_argument("--snapshot-every", type=float, default=300.0, help="seconds between snapshots and checkpoints")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    # A plain store, so the backfill neither restores nor writes the server's
+    # MEMORY_SNAPSHOT_PATH, only the snapshot it was given
+    store = create_store()
+    if os.path.exists(args.snapshot):
+        restore(store, args.snapshot)
+
+    asyncio.run(ingest_transcripts(
+        args.path,
+        store=store,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        report_every=args.report_every,
+        snapshot_path=args.snapshot,
+        snapshot_every=args.snapshot_every,
+        dead_letter_path=args.dead_letter,
+        retries=args.retries,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,183 @@
-"""Long-term memory management for Moana."""
+"""Long-term memory management for Moana.
 
+The store, memory managers and their executors are built lazily on first use,
+so importing this module stays cheap and does not load embedding or chat models.
+"""
+
+import atexit
+import logging
 import os
-from langgraph.store.memory import InMemoryStore
-from langmem import create_memory_store_manager, ReflectionExecutor
+from functools import cache, partial
+from typing import TYPE_CHECKING, Any, Callable
 
 from .models import Episode, Memory, Profile, Triple
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+    from langgraph.store.memory import InMemoryStore
+    from langmem import ReflectionExecutor  # type: ignore[import-untyped]
+    from langmem.knowledge.extraction import (  # type: ignore[import-untyped]
+        ExtractedMemory,
+        MemoryState,
+        MemoryStoreManager,
+    )
 
 # Get model names from environment variables with defaults
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "openai:text-embedding-3-small")
 MEMORY_MODEL = os.environ.get("MEMORY_MODEL", "anthropic:claude-3-5-sonnet-latest")
+EMBEDDING_DIMS = 1536
+
+# When set, the store is restored from this snapshot on creation. The one process
+# that holds the snapshot's writer lock also snapshots it every
+# MEMORY_SNAPSHOT_INTERVAL seconds and on exit
+MEMORY_SNAPSHOT_PATH = os.environ.get("MEMORY_SNAPSHOT_PATH")
+MEMORY_SNAPSHOT_INTERVAL = float(os.environ.get("MEMORY_SNAPSHOT_INTERVAL", "300"))
+
+logger = logging.getLogger(__name__)
+
+MEMORY_KINDS = ("memories", "triples", "profile", "episodes")
+
+MEMORY_MANAGERS: dict[str, dict[str, Any]] = {
+    # Human-readable free format contectual memory
+    # Usefull as backup for other types of memories, but cannot store big amounts of data
+    # Have better search capabilities than triples
+    "memories": {
+        "schemas": [Memory],
+        "instructions": ("Extract user preferences and any other useful information."
+                         "If a memory conflicts with an existing one, then just update it"),
+    },
+    # Machine-readable triples based semantic knowledge memory
+    # Graph based memory that good for reasoning, planning and deduction
+    "triples": {
+        "schemas": [Triple],
+        "instructions": ("Store all new facts, preferences, and relationships as triples."
+                         "If a memory conflicts with an existing one, then just update it"),
+    },
+    # Semantic profile memory that stores base knowledge about the user
+    "profile": {
+        "schemas": [Profile],
+        "instructions": ("Extract user profile information."
+                         "Try to fill profile with as much information as possible"
+                         "Use only avaiable information do not imagine anything"
+                         "If you cannot find any information, then just set as Unknown"
+                         "If it exists, then just update it when need only"
+                         ),
+    },
+    # Episodic memory
+    "episodes": {
+        "schemas": [Episode],
+        "instructions": ("Extract examples of successful explanations,"
+                         "capturing the full chain of reasoning."
+                         "Be concise in your explanations and precise in the logic of your reasoning."),
+    },
+}
+
+
+def create_store() -> "InMemoryStore":
+    """Create an empty long-term memory store, without any persistence."""
+    from langgraph.store.memory import InMemoryStore
+
+    return InMemoryStore(
+        index={
+            "dims": EMBEDDING_DIMS,
+            "embed": EMBEDDING_MODEL,
+        }
+    )
+
+
+@cache
+def get_memory_store() -> "InMemoryStore":
+    """Get the shared long-term memory store, creating it on first call.
+
+    If MEMORY_SNAPSHOT_PATH is set, the store is restored from the snapshot,
+    and if no other process writes to it, kept snapshotted in the background,
+    see moana.memory.snapshot.
+    """
+    store = create_store()
+
+    if MEMORY_SNAPSHOT_PATH:
+        from .snapshot import (
+            acquire_writer_lock,
+            restore,
+            snapshot,
+            start_periodic_snapshots,
+        )
+
+        if os.path.exists(MEMORY_SNAPSHOT_PATH):
+            restore(store, MEMORY_SNAPSHOT_PATH)
+        writer_lock = acquire_writer_lock(MEMORY_SNAPSHOT_PATH)
+        if writer_lock is None:
+            logger.warning(
+                "Another process writes snapshots to %s, memories of this process will not be persisted",
+                MEMORY_SNAPSHOT_PATH,
+            )
+        else:
+            # Keep the lock for the life of the process
+            atexit.register(writer_lock.close)
+            if MEMORY_SNAPSHOT_INTERVAL > 0:
+                start_periodic_snapshots(store, MEMORY_SNAPSHOT_PATH, MEMORY_SNAPSHOT_INTERVAL)
+            atexit.register(snapshot, store, MEMORY_SNAPSHOT_PATH)
+
+    return store
+
+
+@cache
+def get_memory_manager(kind: str) -> "MemoryStoreManager":
+    """Get the memory manager for a memory kind, creating it on first call.
+
+    Args:
+        kind (str): One of MEMORY_KINDS.
+    """
+    from langmem import create_memory_store_manager
+
+    return create_memory_store_manager(
+        MEMORY_MODEL,
+        # Store memories in the "{user_id}/<kind>" namespace
+        namespace=("{user_id}", kind),
+        **MEMORY_MANAGERS[kind],
+    )
+
+
+@cache
+def get_memory_extractor(kind: str) -> "Runnable[MemoryState, list[ExtractedMemory]]":
+    """Get a store-less extractor for a memory kind, creating it on first call.
+
+    Uses the same schemas and instructions as the memory manager, but returns
+    extracted memories instead of writing them, so callers can batch store writes.
+
+    Args:
+        kind (str): One of MEMORY_KINDS.
+    """
+    from langmem import create_memory_manager
+
+    extractor: Runnable[MemoryState, list[ExtractedMemory]] = create_memory_manager(
+        MEMORY_MODEL, **MEMORY_MANAGERS[kind]
+    )
+    return extractor
+
+
+@cache
+def get_memory_executor(kind: str) -> "ReflectionExecutor":
+    """Get the ReflectionExecutor wrapping the manager of a memory kind for deferred processing.
+
+    Args:
+        kind (str): One of MEMORY_KINDS.
+    """
+    from langmem import ReflectionExecutor
+
+    return ReflectionExecutor(get_memory_manager(kind))
+
+
+_LAZY_ATTRIBUTES: dict[str, Callable[[], Any]] = {
+    "store": get_memory_store,
+    **{f"{kind}_manager": partial(get_memory_manager, kind) for kind in MEMORY_KINDS},
+    **{f"{kind}_executor": partial(get_memory_executor, kind) for kind in MEMORY_KINDS},
+}
+
 
-# Initialize memory store
-store = InMemoryStore(
-    index={
-        "dims": 1536,
-        "embed": EMBEDDING_MODEL,
-    }
-)
-
-# Human-readable free format contectual memory
-# Usefull as backup for other types of memories, but cannot store big amounts of data
-# Have better search capabilities than triples
-memories_manager = create_memory_store_manager(
-    MEMORY_MODEL,
-    # Store memories in the "memories" namespace
-    namespace=("{user_id}", "memories"),
-    schemas=[Memory],
-    instructions=("Extract user preferences and any other useful information." 
-                  "If a memory conflicts with an existing one, then just update it"),
-)
-
-# Wrap memorys_manager with ReflectionExecutor for deferred processing
-memories_executor = ReflectionExecutor(memories_manager) 
-
-# Machine-readable triples based semantic knowledge memory
-# Graph based memory that good for reasoning, planning and deduction
-triples_manager = create_memory_store_manager(
-    MEMORY_MODEL,
-    namespace=("{user_id}", "triples"),
-    schemas=[Triple],
-    instructions=("Store all new facts, preferences, and relationships as triples."
-                  "If a memory conflicts with an existing one, then just update it"),
-)
-
-# Wrap triples_manager with ReflectionExecutor for deferred processing
-triples_executor = ReflectionExecutor(triples_manager) 
-
-# Semantic profile memory that stores base knowledge about the user
-profile_manager = create_memory_store_manager(
-    MEMORY_MODEL,
-    namespace=("{user_id}", "profile"),
-    schemas=[Profile],
-    instructions=("Extract user profile information."
-                  "Try to fill profile with as much information as possible"
-                  "Use only avaiable information do not imagine anything"
-                  "If you cannot find any information, then just set as Unknown"
-                  "If it exists, then just update it when need only"
-                  ),
-)
-
-# Wrap profile_manager with ReflectionExecutor for deferred processing
-profile_executor = ReflectionExecutor(profile_manager) 
-
-# Episodic memory
-episodes_manager = create_memory_store_manager(
-    MEMORY_MODEL,
-    namespace=("{user_id}", "episodes"),
-    schemas=[Episode],
-    instructions="Extract examples of successful explanations," 
-    "capturing the full chain of reasoning."
-    "Be concise in your explanations and precise in the logic of your reasoning."
-)
-
-# Wrap episodes_manager with ReflectionExecutor for deferred processing
-episodes_executor = ReflectionExecutor(episodes_manager) 
+def __getattr__(name: str) -> Any:
+    # Keep module-level names like `store` or `memories_executor` available,
+    # but only build them when they are accessed
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
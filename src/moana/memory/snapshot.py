@@ -0,0 +1,271 @@
+"""Binary snapshots of the long-term memory store for warm restarts.
+
+The in-memory store keeps every item and its embeddings only in process memory.
+A snapshot writes them to a single file, so a restarted process can restore
+all users' memories without re-embedding anything.
+
+File layout:
+
+    MAGIC | namespace block | namespace block | ... | manifest | manifest length | MAGIC
+
+Each namespace block is columnar: a vector block of float32 rows of equal dimension,
+followed by a JSON values block with the keys, values, timestamps and the
+(key, path) each vector row belongs to. The manifest is JSON with the offsets
+of every block.
+
+A snapshot path has a single writer: the process holding its lock, see
+`acquire_writer_lock`. Any number of processes may restore from it. The store
+lives in process memory, so processes that should all persist their memories
+need a snapshot path each.
+
+Restore maps the file with mmap and hands out vectors as views into the mapping,
+so vectors are paged in by the OS on first search instead of being read up front.
+Snapshots only copy dict references while collecting, and are written off the
+request path: periodically in a background thread, see `start_periodic_snapshots`,
+or in `asyncio.to_thread` by the bulk ingestion.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, cast
+
+from langgraph.store.base import Item
+from langgraph.store.memory import InMemoryStore
+
+MAGIC = b"MOANASN1"
+VERSION = 1
+# Vector blocks are aligned so float32 views into the mapping are aligned too
+ALIGNMENT = 8
+
+_MANIFEST_LENGTH = struct.Struct("<Q")
+
+logger = logging.getLogger(__name__)
+
+# Only one snapshot is written at a time within a process
+_snapshot_lock = threading.Lock()
+
+
+def acquire_writer_lock(path: str) -> Optional[IO[bytes]]:
+    """Try to become the only process writing snapshots to `path`.
+
+    The lock is held as long as the returned file stays open,
+    and is released when it is closed or the process exits.
+
+    Args:
+        path (str): Path of the snapshot file.
+
+    Returns:
+        The open lock file, or None if another process already writes to `path`.
+    """
+    lock_file = open(f"{path}.lock", "ab")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _collect(store: InMemoryStore) -> Iterator[Tuple[Tuple[str, ...], Dict[str, Item], Dict[str, Dict[str, Any]]]]:
+    """Yield a copy of every namespace's items and vectors.
+
+    Copying a dict is a single operation under the GIL, so this is safe
+    while requests keep writing to the store from other threads.
+    """
+    for namespace, items in list(store._data.items()):
+        items = dict(items)
+        if not items:
+            continue
+        vectors = {
+            key: dict(paths)
+            for key, paths in list(store._vectors.get(namespace, {}).items())
+            if key in items
+        }
+        yield namespace, items, vectors
+
+
+def _pad(file: IO[bytes]) -> None:
+    """Pad the file up to the next aligned offset."""
+    file.write(b"\0" * (-file.tell() % ALIGNMENT))
+
+
+def _vector_bytes(vector: Any) -> bytes:
+    """Encode a vector as float32 bytes, reusing the buffer of restored vectors."""
+    if isinstance(vector, memoryview):
+        return vector.tobytes()
+    return array("f", vector).tobytes()
+
+
+def _write_namespace(file: IO[bytes], namespace: Tuple[str, ...], items: Dict[str, Item], vectors: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Write one namespace block and return its manifest entry."""
+    rows = [(key, path, vector) for key, paths in vectors.items() for path, vector in paths.items()]
+    dims = len(rows[0][2]) if rows else 0
+
+    _pad(file)
+    vectors_offset = file.tell()
+    for _, _, vector in rows:
+        if len(vector) != dims:
+            raise ValueError(f"Vectors in namespace {namespace} have different dimensions")
+        file.write(_vector_bytes(vector))
+
+    values = json.dumps({
+        "keys": list(items),
+        "values": [item.value for item in items.values()],
+        "created_at": [item.created_at.isoformat() for item in items.values()],
+        "updated_at": [item.updated_at.isoformat() for item in items.values()],
+        "row_keys": [key for key, _, _ in rows],
+        "row_paths": [path for _, path, _ in rows],
+    }).encode()
+    values_offset = file.tell()
+    file.write(values)
+
+    return {
+        "namespace": list(namespace),
+        "items": len(items),
+        "vectors_offset": vectors_offset,
+        "rows": len(rows),
+        "dims": dims,
+        "values_offset": values_offset,
+        "values_length": len(values),
+    }
+
+
+def snapshot(store: InMemoryStore, path: str) -> int:
+    """Write a snapshot of an in-memory store to a file.
+
+    The snapshot is written to a temporary file and moved into place,
+    so readers never see a partially written snapshot. Callers must hold
+    the writer lock of `path`, see `acquire_writer_lock`.
+
+    Args:
+        store: The InMemoryStore to snapshot.
+        path (str): Path of the snapshot file.
+
+    Returns:
+        int: Number of items written.
+    """
+    with _snapshot_lock:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+        )
+        namespaces: List[Dict[str, Any]] = []
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(MAGIC)
+                for namespace, items, vectors in _collect(store):
+                    namespaces.append(_write_namespace(file, namespace, items, vectors))
+                manifest = json.dumps({
+                    "version": VERSION,
+                    "byteorder": sys.byteorder,
+                    "namespaces": namespaces,
+                }).encode()
+                file.write(manifest)
+                file.write(_MANIFEST_LENGTH.pack(len(manifest)))
+                file.write(MAGIC)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return sum(entry["items"] for entry in namespaces)
+
+
+def start_periodic_snapshots(store: InMemoryStore, path: str, interval: float) -> threading.Event:
+    """Snapshot a store every `interval` seconds in a background thread.
+
+    A failed snapshot is logged and retried on the next interval.
+
+    Args:
+        store: The InMemoryStore to snapshot.
+        path (str): Path of the snapshot file.
+        interval (float): Seconds between snapshots.
+
+    Returns:
+        threading.Event: Set it to stop taking snapshots.
+    """
+    stopped = threading.Event()
+
+    def run() -> None:
+        while not stopped.wait(interval):
+            try:
+                snapshot(store, path)
+            except Exception:
+                logger.exception("Failed to snapshot the memory store to %s", path)
+
+    threading.Thread(target=run, name="moana-periodic-snapshot", daemon=True).start()
+    return stopped
+
+
+def restore(store: InMemoryStore, path: str) -> int:
+    """Restore a snapshot into an in-memory store, without re-embedding.
+
+    Values are decoded right away, vectors stay in the memory-mapped file
+    and are read when a search first touches them.
+
+    Args:
+        store: The InMemoryStore to restore into.
+        path (str): Path of the snapshot file.
+
+    Returns:
+        int: Number of items restored.
+    """
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    trailer = len(MAGIC) + _MANIFEST_LENGTH.size
+    if mapping[:len(MAGIC)] != MAGIC or mapping[-len(MAGIC):] != MAGIC:
+        raise ValueError(f"{path} is not a memory store snapshot")
+    (manifest_length,) = _MANIFEST_LENGTH.unpack_from(mapping, len(mapping) - trailer)
+    manifest_offset = len(mapping) - trailer - manifest_length
+    manifest = json.loads(mapping[manifest_offset:manifest_offset + manifest_length])
+    if manifest["version"] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest['version']} in {path}")
+    # Vectors can only be viewed in place when they were written with this byte order
+    native = manifest["byteorder"] == sys.byteorder
+
+    restored = 0
+    buffer = memoryview(mapping)
+    for entry in manifest["namespaces"]:
+        namespace = tuple(entry["namespace"])
+        offset = entry["values_offset"]
+        columns = json.loads(mapping[offset:offset + entry["values_length"]])
+
+        items = store._data[namespace]
+        for key, value, created_at, updated_at in zip(
+            columns["keys"], columns["values"], columns["created_at"], columns["updated_at"]
+        ):
+            items[key] = Item(
+                value=value,
+                key=key,
+                namespace=namespace,
+                created_at=datetime.fromisoformat(created_at),
+                updated_at=datetime.fromisoformat(updated_at),
+            )
+        restored += len(columns["keys"])
+
+        dims = entry["dims"]
+        start = entry["vectors_offset"]
+        block = buffer[start:start + entry["rows"] * dims * 4].cast("f")
+        if not native:
+            swapped = array("f", block)
+            swapped.byteswap()
+            block = memoryview(swapped)
+        vectors = store._vectors[namespace]
+        for row, (key, path_) in enumerate(zip(columns["row_keys"], columns["row_paths"])):
+            # The store only iterates over vectors, so a float32 view stands in for a list
+            vectors[key][path_] = cast(List[float], block[row * dims:(row + 1) * dims])
+
+    return restored
@@ -2,7 +2,7 @@
 
 from typing import List, Any
 from langgraph.config import get_store
-from .long_term import memories_executor, triples_executor, profile_executor, episodes_executor
+from .long_term import get_memory_executor
 from moana.state import State
 from moana.configuration import Configuration
 
@@ -146,11 +146,12 @@ def memorize(state: State, system_message: str, response_content: str):
     }
     
     # Use the executors to schedule memory processing with a delay
+    # Executors are created on first use, so the first conversation pays for their setup
     # Save contextual memory
-    memories_executor.submit(to_process, after_seconds=0.5) 
+    get_memory_executor("memories").submit(to_process, after_seconds=0.5)
     # Save semantic memory
-    triples_executor.submit(to_process, after_seconds=0.5) 
+    get_memory_executor("triples").submit(to_process, after_seconds=0.5)
     # Save semantic profile memory
-    profile_executor.submit(to_process, after_seconds=0.5) 
+    get_memory_executor("profile").submit(to_process, after_seconds=0.5)
     # Save episodic memory
-    episodes_executor.submit(to_process, after_seconds=0.5) 
\ No newline at end of file
+    get_memory_executor("episodes").submit(to_process, after_seconds=0.5) 
\ No newline at end of file
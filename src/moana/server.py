@@ -0,0 +1,14 @@
+"""Graph entry point for the LangGraph server.
+
+`langgraph.json` points here instead of at `moana.graph`, so the server warms up
+while it loads the graph, before it accepts traffic. Importing `moana` itself
+stays cheap, this module is only loaded by the serving process.
+"""
+
+from moana import get_graph
+from moana.warmup import warmup
+
+warmup()
+
+# Compiled during warm-up, this only returns the cached graph
+graph = get_graph()
@@ -1,5 +1,7 @@
 """Utility & helper functions."""
 
+from functools import cache
+
 from langchain.chat_models import init_chat_model
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage
@@ -17,9 +19,12 @@ def get_message_text(msg: BaseMessage) -> str:
         return "".join(txts).strip()
 
 
+@cache
 def load_chat_model(fully_specified_name: str) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Models are cached by name, so the client is created once and reused across calls.
+
     Args:
         fully_specified_name (str): String in the format 'provider:model'.
     """
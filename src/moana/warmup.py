@@ -0,0 +1,51 @@
+"""Warm-up for Moana serving processes.
+
+Importing moana is cheap because the graph, memory store, memory executors and
+model clients are all built lazily. `warmup` builds them up front, and has to run
+in the process that serves traffic, which `moana.server` does at load time.
+
+Running `python -m moana.warmup` only prints how long each step takes,
+it does not warm up any other process.
+"""
+
+import importlib
+import time
+from typing import Callable, Dict
+
+from moana.configuration import Configuration
+from moana.memory.long_term import MEMORY_KINDS, get_memory_executor, get_memory_store
+from moana.utils import load_chat_model
+
+
+def _timed(steps: Dict[str, float], name: str, step: Callable[[], object]) -> None:
+    """Run a warm-up step and record how long it took."""
+    started = time.perf_counter()
+    step()
+    steps[name] = time.perf_counter() - started
+
+
+def warmup() -> Dict[str, float]:
+    """Pre-initialize everything the agent builds lazily.
+
+    This includes restoring the memory store from MEMORY_SNAPSHOT_PATH, if set.
+
+    Returns:
+        Dict[str, float]: Seconds spent on each warm-up step.
+    """
+    import moana
+
+    configuration = Configuration.from_runnable_config({})
+    steps: Dict[str, float] = {}
+
+    _timed(steps, "memory_store", get_memory_store)
+    _timed(steps, "memory_executors", lambda: [get_memory_executor(kind) for kind in MEMORY_KINDS])
+    _timed(steps, "chat_model", lambda: load_chat_model(configuration.model))
+    _timed(steps, "tools", lambda: importlib.import_module("langchain_community.tools.tavily_search"))
+    _timed(steps, "graph", moana.get_graph)
+
+    return steps
+
+
+if __name__ == "__main__":
+    for name, seconds in warmup().items():
+        print(f"{name}: {seconds:.3f}s")  # noqa: T201
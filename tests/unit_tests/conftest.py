@@ -0,0 +1,20 @@
+from typing import Callable
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+
+def _embed(texts: list[str]) -> list[list[float]]:
+    """Embed texts without a model, close enough for search results to be ranked."""
+    return [[float(len(text)), float(text.count("a")), 1.0] for text in texts]
+
+
+@pytest.fixture
+def make_store() -> Callable[[], InMemoryStore]:
+    """Create empty in-memory stores that embed with a fake model."""
+    return lambda: InMemoryStore(index={"dims": 3, "embed": _embed})
+
+
+@pytest.fixture
+def store(make_store: Callable[[], InMemoryStore]) -> InMemoryStore:
+    return make_store()
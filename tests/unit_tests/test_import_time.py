@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+# Import-time budget for `import moana`, in seconds
+IMPORT_TIME_BUDGET = 1.0
+
+# Modules that are slow to import and must only be loaded on first use
+LAZY_MODULES = ["moana.graph", "langmem", "langchain_community", "langgraph.store.memory"]
+
+
+def _run(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def test_import_does_not_load_heavy_modules() -> None:
+    loaded = _run(
+        "import sys, moana\n"
+        f"print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    )
+    assert loaded.strip() == "[]"
+
+
+def test_import_time_budget() -> None:
+    elapsed = _run(
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "import moana\n"
+        "print(time.perf_counter() - started)"
+    )
+    assert float(elapsed) < IMPORT_TIME_BUDGET
+
+
+def test_graph_submodule_does_not_shadow_the_compiled_graph() -> None:
+    graph = _run(
+        "import sys\n"
+        "import moana.graph\n"
+        "from moana.graph import builder\n"
+        "# Stand in for compilation, which needs model API keys\n"
+        "sys.modules['moana.graph'].get_graph = lambda: 'compiled'\n"
+        "import moana.warmup\n"
+        "from moana import graph, warmup\n"
+        "print(graph, warmup.__name__)"
+    )
+    assert graph.strip() == "compiled warmup"
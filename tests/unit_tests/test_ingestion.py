@@ -0,0 +1,294 @@
+import asyncio
+import json
+import sys
+from typing import Any
+
+import pytest
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+from langmem.knowledge.extraction import ExtractedMemory
+from pydantic import BaseModel
+
+from moana.memory import ingestion, long_term
+from moana.memory.ingestion import (
+    IngestionStats,
+    _Progress,
+    _with_retries,
+    _Worker,
+    ingest_transcripts,
+    load_checkpoint,
+    read_transcripts,
+    save_checkpoint,
+)
+from moana.memory.snapshot import restore
+
+
+def _write_transcripts(path, user_ids):
+    with open(path, "w") as file:
+        for user_id in user_ids:
+            file.write(json.dumps({"user_id": user_id, "messages": [{"role": "user", "content": "hi"}]}) + "\n")
+            file.write("\n")
+
+
+def test_read_transcripts_resumes_from_offset(tmp_path) -> None:
+    path = tmp_path / "transcripts.jsonl"
+    _write_transcripts(path, ["a", "b", "c"])
+
+    transcripts = list(read_transcripts(str(path)))
+    assert [t.user_id for t in transcripts] == ["a", "b", "c"]
+
+    resumed = list(read_transcripts(str(path), transcripts[0].end_offset))
+    assert [t.user_id for t in resumed] == ["b", "c"]
+
+
+def test_progress_only_advances_over_persisted_prefix(tmp_path) -> None:
+    path = tmp_path / "transcripts.jsonl"
+    _write_transcripts(path, ["a", "b", "c"])
+    first, second, third = read_transcripts(str(path))
+
+    progress = _Progress(0)
+    progress.mark_done([third])
+    assert progress.offset == 0
+    progress.mark_done([first])
+    assert progress.offset == first.end_offset
+    progress.mark_done([second])
+    assert progress.offset == third.end_offset
+    assert progress.persisted == 3
+
+
+def test_checkpoint_round_trip(tmp_path) -> None:
+    path = str(tmp_path / "ingest.ckpt")
+    assert load_checkpoint(path) == {"offset": 0, "conversations": 0}
+    save_checkpoint(path, {"offset": 42, "conversations": 3})
+    assert load_checkpoint(path) == {"offset": 42, "conversations": 3}
+
+
+def test_flush_writes_identical_values_of_different_users(store) -> None:
+    worker = _Worker(store, batch_size=10, progress=_Progress(0), stats=IngestionStats())
+    value = {"kind": "Profile", "content": {"name": "Unknown"}}
+    for user_id in ["a", "b"]:
+        namespace = (user_id, "profile")
+        worker._pending[(namespace, "1")] = PutOp(namespace, "1", value)
+
+    asyncio.run(worker.flush())
+
+    for user_id in ["a", "b"]:
+        results = store.search((user_id, "profile"), query="Unknown")
+        assert [r.value for r in results] == [value]
+        assert results[0].score is not None
+
+
+class Fact(BaseModel):
+    text: str
+
+
+class FakeExtractor:
+    """Extract one memory per user message, failing on messages containing "fail".
+
+    Like langmem's memory manager, also returns every existing memory it did
+    not update, with its content as a plain dict.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.calls: list[dict[str, Any]] = []
+
+    async def ainvoke(self, input: dict[str, Any]) -> list[ExtractedMemory]:
+        self.calls.append(input)
+        texts = [m["content"] for m in input["messages"] if m["role"] == "user"]
+        if any("fail" in text for text in texts):
+            raise ValueError("prompt is too long")
+        extracted = {f"{self.kind}-{text}": ExtractedMemory(f"{self.kind}-{text}", Fact(text=text)) for text in texts}
+        untouched = [
+            ExtractedMemory(key, content) for key, _, content in input["existing"] if key not in extracted
+        ]
+        return untouched + list(extracted.values())
+
+
+def _stub_extractors(monkeypatch) -> dict[str, FakeExtractor]:
+    extractors = {kind: FakeExtractor(kind) for kind in ingestion.MEMORY_KINDS}
+    monkeypatch.setattr(ingestion, "get_memory_extractor", extractors.__getitem__)
+    return extractors
+
+
+def test_bad_conversations_are_skipped(tmp_path, monkeypatch, store) -> None:
+    _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    with open(path, "w") as file:
+        file.write('{"user_id": "a", "messages": [{"role": "user", "content": "one"}]}\n')
+        file.write("not json\n")
+        file.write('{"messages": []}\n')
+        file.write('{"user_id": "a", "messages": [{"role": "user", "content": "fail"}]}\n')
+        file.write('{"user_id": "a", "messages": [{"role": "user", "content": "two"}]}\n')
+    dead_letter = tmp_path / "dead.jsonl"
+
+    stats = asyncio.run(ingest_transcripts(
+        str(path), store=store, workers=2, dead_letter_path=str(dead_letter), report_every=60,
+    ))
+
+    assert (stats.conversations, stats.skipped) == (2, 3)
+    assert sorted(item.key for item in store.search(("a", "memories"))) == ["memories-one", "memories-two"]
+    dead = [json.loads(line) for line in open(dead_letter)]
+    assert [record.get("line") for record in dead[:2]] == ["not json\n", '{"messages": []}\n']
+    assert dead[2]["messages"] == [{"role": "user", "content": "fail"}]
+
+
+def test_transient_errors_are_retried() -> None:
+    attempts = []
+
+    async def call() -> str:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise TimeoutError("timed out")
+        return "ok"
+
+    assert asyncio.run(_with_retries(call, retries=3, retry_delay=0)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_checkpoint_requires_snapshot(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        asyncio.run(ingest_transcripts(
+            str(tmp_path / "transcripts.jsonl"), checkpoint_path=str(tmp_path / "ingest.ckpt"), snapshot_path=None,
+        ))
+
+
+def _write_conversations(path, conversations: list[tuple[str, str]]) -> None:
+    with open(path, "w") as file:
+        for user_id, text in conversations:
+            file.write(json.dumps({"user_id": user_id, "messages": [{"role": "user", "content": text}]}) + "\n")
+
+
+def test_ingest_transcripts(tmp_path, monkeypatch, store, make_store) -> None:
+    extractors = _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "one"), ("b", "two"), ("a", "three"), ("c", "four"), ("a", "five")])
+    checkpoint_path = str(tmp_path / "ingest.ckpt")
+    snapshot_path = str(tmp_path / "memory.snap")
+    workers_by_user: dict[str, set[int]] = {}
+    ingest = _Worker.ingest
+
+    async def recording_ingest(self: _Worker, transcript: ingestion.Transcript) -> None:
+        workers_by_user.setdefault(transcript.user_id, set()).add(id(self))
+        await ingest(self, transcript)
+
+    monkeypatch.setattr(_Worker, "ingest", recording_ingest)
+
+    stats = asyncio.run(ingest_transcripts(
+        str(path), store=store, workers=2, batch_size=100,
+        checkpoint_path=checkpoint_path, snapshot_path=snapshot_path, report_every=60,
+    ))
+
+    assert (stats.conversations, stats.memories, stats.skipped) == (5, 20, 0)
+    assert all(len(workers) == 1 for workers in workers_by_user.values())
+
+    # A user's conversations are extracted in file order, and later ones see
+    # the memories of earlier ones that are still waiting to be written
+    calls = [c for c in extractors["memories"].calls if c["messages"][0]["content"] in ("one", "three", "five")]
+    assert [c["messages"][0]["content"] for c in calls] == ["one", "three", "five"]
+    assert [sorted(key for key, _, _ in c["existing"]) for c in calls] == [
+        [], ["memories-one"], ["memories-one", "memories-three"],
+    ]
+
+    # The checkpoint covers the whole file, and the snapshot holds every memory
+    assert load_checkpoint(checkpoint_path) == {"offset": path.stat().st_size, "conversations": 5}
+    restored = make_store()
+    assert restore(restored, snapshot_path) == 20
+    assert len(restored.search(("a", "triples"))) == 3
+    assert {item.value["kind"] for item in restored.search(("a", "memories"))} == {"Fact"}
+
+
+def test_untouched_existing_memories_are_not_rewritten(tmp_path, monkeypatch, store) -> None:
+    _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "two")])
+    namespace = ("a", "memories")
+    store.put(namespace, "1", {"kind": "Memory", "content": {"content": "likes bananas"}})
+    store.put(namespace, "memories-two", {"kind": "Fact", "content": {"text": "two"}})
+    before = {item.key: item for item in store.search(namespace)}
+
+    stats = asyncio.run(ingest_transcripts(str(path), store=store, workers=1, report_every=60))
+
+    # Only the three other kinds get a new memory, both existing ones are left as they were
+    assert stats.memories == 3
+    after = {item.key: item for item in store.search(namespace)}
+    assert {key: (item.value, item.created_at) for key, item in after.items()} == {
+        key: (item.value, item.created_at) for key, item in before.items()
+    }
+
+
+def test_existing_memories_are_searched_by_the_conversation(tmp_path, monkeypatch) -> None:
+    extractors = _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "bananas")])
+    # Only texts about bananas are close to the conversation
+    store = InMemoryStore(index={"dims": 2, "embed": lambda texts: [[float("banana" in t), 1.0] for t in texts]})
+    namespace = ("a", "memories")
+    for i in range(ingestion.EXISTING_MEMORIES_LIMIT + 5):
+        store.put(namespace, str(i), {"kind": "Memory", "content": {"content": f"fact {i}"}})
+    store.put(namespace, "bananas", {"kind": "Memory", "content": {"content": "likes bananas"}})
+
+    asyncio.run(ingest_transcripts(str(path), store=store, workers=1, report_every=60))
+
+    existing = [key for key, _, _ in extractors["memories"].calls[0]["existing"]]
+    assert len(existing) == ingestion.EXISTING_MEMORIES_LIMIT
+    assert existing[0] == "bananas"
+
+
+def test_ingest_transcripts_flushes_at_batch_size(tmp_path, monkeypatch, store) -> None:
+    _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "one"), ("a", "two"), ("a", "three")])
+    flushed: list[int] = []
+    flush = _Worker.flush
+
+    async def counting_flush(self: _Worker) -> None:
+        flushed.append(len(self._pending))
+        await flush(self)
+
+    monkeypatch.setattr(_Worker, "flush", counting_flush)
+
+    asyncio.run(ingest_transcripts(str(path), store=store, workers=1, batch_size=8, report_every=60))
+
+    # Each conversation adds 4 memories, so every second one fills a batch
+    assert flushed == [8, 4]
+
+
+def test_snapshots_are_taken_every_snapshot_interval(tmp_path, monkeypatch, store) -> None:
+    _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "one"), ("b", "two")])
+    snapshots: list[str] = []
+    monkeypatch.setattr(ingestion, "snapshot", lambda store, snapshot_path: snapshots.append(snapshot_path))
+    extract = _Worker.extract
+
+    async def slow_extract(self: _Worker, transcript: ingestion.Transcript, kind: str, existing: Any) -> list[PutOp]:
+        await asyncio.sleep(0.05)
+        return await extract(self, transcript, kind, existing)
+
+    monkeypatch.setattr(_Worker, "extract", slow_extract)
+
+    asyncio.run(ingest_transcripts(
+        str(path), store=store, workers=1, report_every=0.01, snapshot_every=60,
+        snapshot_path=str(tmp_path / "memory.snap"),
+    ))
+
+    # Progress is reported several times, but the store is only snapshotted at the end
+    assert snapshots == [str(tmp_path / "memory.snap")]
+
+
+def test_cli_does_not_touch_the_server_snapshot(tmp_path, monkeypatch, make_store) -> None:
+    _stub_extractors(monkeypatch)
+    path = tmp_path / "transcripts.jsonl"
+    _write_conversations(path, [("a", "one")])
+    server_snapshot = tmp_path / "server.snap"
+    monkeypatch.setenv("MEMORY_SNAPSHOT_PATH", str(server_snapshot))
+    monkeypatch.setattr(long_term, "MEMORY_SNAPSHOT_PATH", str(server_snapshot))
+    monkeypatch.setattr(ingestion, "create_store", make_store)
+    backfill_snapshot = tmp_path / "backfill.snap"
+    monkeypatch.setattr(sys, "argv", ["ingestion", str(path), "--snapshot", str(backfill_snapshot)])
+
+    ingestion.main()
+
+    assert backfill_snapshot.exists()
+    assert not [p.name for p in tmp_path.iterdir() if p.name.startswith("server.snap")]
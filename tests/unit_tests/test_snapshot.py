@@ -0,0 +1,53 @@
+import os
+import threading
+
+from moana.memory.snapshot import acquire_writer_lock, restore, snapshot
+
+
+def test_snapshot_round_trip(tmp_path, store, make_store) -> None:
+    path = str(tmp_path / "memory.snap")
+    store.put(("user123", "memories"), "1", {"kind": "Memory", "content": {"content": "likes bananas"}})
+    store.put(("user123", "memories"), "2", {"kind": "Memory", "content": {"content": "lives in Oslo"}})
+    store.put(("user123", "profile"), "3", {"kind": "Profile", "content": {"name": "Ana"}})
+
+    assert snapshot(store, path) == 3
+
+    restored = make_store()
+    assert restore(restored, path) == 3
+    assert restored.get(("user123", "profile"), "3").value == {"kind": "Profile", "content": {"name": "Ana"}}
+
+    expected = store.search(("user123", "memories"), query="bananas")
+    results = restored.search(("user123", "memories"), query="bananas")
+    assert [(r.key, r.value, round(r.score, 6)) for r in results] == [
+        (r.key, r.value, round(r.score, 6)) for r in expected
+    ]
+
+    # Restored vectors can be snapshotted again without re-embedding
+    assert snapshot(restored, path) == 3
+    assert restore(make_store(), path) == 3
+
+
+def test_single_snapshot_writer(tmp_path) -> None:
+    path = str(tmp_path / "memory.snap")
+    writer = acquire_writer_lock(path)
+    assert writer is not None
+    assert acquire_writer_lock(path) is None
+
+    writer.close()
+    assert acquire_writer_lock(path) is not None
+
+
+def test_concurrent_snapshots_leave_a_complete_file(tmp_path, make_store) -> None:
+    path = str(tmp_path / "memory.snap")
+    stores = [make_store() for _ in range(4)]
+    for i, store in enumerate(stores):
+        store.put((f"user{i}", "memories"), "1", {"kind": "Memory", "content": {"content": f"fact {i}"}})
+
+    threads = [threading.Thread(target=snapshot, args=(store, path)) for store in stores for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert restore(make_store(), path) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]